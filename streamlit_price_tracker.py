@@ -7,7 +7,11 @@ Files produced here:
 Requirements (pip):
 streamlit
 requests
-beautifulsoup4
+aiohttp
+aiodns
+beautifulsoup4>=4.13
+soupsieve
+lxml
 sqlalchemy
 apscheduler
 pandas
@@ -15,7 +19,7 @@ plotly
 python-dotenv
 
 Install:
-pip install streamlit requests beautifulsoup4 sqlalchemy apscheduler pandas plotly python-dotenv
+pip install streamlit requests aiohttp aiodns "beautifulsoup4>=4.13" soupsieve lxml sqlalchemy apscheduler pandas plotly python-dotenv
 
 Run:
 streamlit run streamlit_price_tracker.py
@@ -36,17 +40,29 @@ Security & production:
 """
 
 import streamlit as st
+import asyncio
+import aiohttp
+from aiohttp.resolver import AsyncResolver
 import requests
-from bs4 import BeautifulSoup
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, MetaData, Table
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.dammit import EncodingDetector
+import soupsieve as sv
+from sqlalchemy import event, create_engine, Column, Integer, String, Float, DateTime, MetaData, Table, Index, func, and_, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 import pandas as pd
 import plotly.express as px
 from datetime import datetime
+from functools import lru_cache, partial
+from html import unescape
+import re
 import time
+from urllib.parse import urlparse, urlunparse
 import smtplib
+import threading
 import os
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -59,6 +75,7 @@ load_dotenv()
 # -------------------------------
 DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///prices.db')
 SCRAPE_INTERVAL_MINUTES = int(os.getenv('SCRAPE_INTERVAL_MINUTES', '360'))  # default every 6 hours
+SCRAPE_CONCURRENCY = int(os.getenv('SCRAPE_CONCURRENCY', '10'))  # max pages fetched at once by the scheduled job
 SMTP_HOST = os.getenv('SMTP_HOST', '')
 SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
 SMTP_USER = os.getenv('SMTP_USER', '')
@@ -80,14 +97,53 @@ class Product(Base):
 
 class PriceHistory(Base):
     __tablename__ = 'price_history'
+    # latest-price lookups filter on product_id and order by timestamp
+    __table_args__ = (Index('ix_ph_product_time', 'product_id', 'timestamp'),)
     id = Column(Integer, primary_key=True)
     product_id = Column(Integer)
     price = Column(Float)
     timestamp = Column(DateTime)
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine)
-Base.metadata.create_all(bind=engine)
+# Core handle for bulk inserts that don't need the ORM unit of work
+price_history_t = PriceHistory.__table__
+
+def _set_sqlite_pragmas(dbapi_conn, _):
+    # WAL lets the UI read while the scheduler writes; NORMAL skips the fsync on every commit
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.close()
+
+
+# Streamlit re-executes this script on every rerun; caching the engine and session factory
+# keeps one connection pool for the whole process instead of building a new one each time.
+@st.cache_resource
+def get_engine():
+    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, pool_size=5, pool_pre_ping=True)
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add the index to older databases explicitly
+    for index in PriceHistory.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    return engine
+
+
+@st.cache_resource
+def get_sessionmaker():
+    return sessionmaker(bind=get_engine())
+
+
+def get_latest_prices(session):
+    """Return {product_id: price} for the most recent history row of every product, using a single query."""
+    latest = (session.query(PriceHistory.product_id, func.max(PriceHistory.timestamp).label('timestamp'))
+              .group_by(PriceHistory.product_id)
+              .subquery())
+    rows = (session.query(PriceHistory.product_id, PriceHistory.price)
+            .join(latest, and_(PriceHistory.product_id == latest.c.product_id,
+                               PriceHistory.timestamp == latest.c.timestamp))
+            .all())
+    return dict(rows)
 
 # -------------------------------
 # Scraper helpers
@@ -96,32 +152,94 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)'
 }
 
+# pages are read in chunks up to this size; anything past it is dropped rather than buffered
+MAX_PAGE_BYTES = 2_000_000
+CHUNK_SIZE = 65536
 
+
+@st.cache_resource
+def get_http_session():
+    """One requests.Session per server process (not per rerun), so connections to the same host are pooled
+    and reused across scrapes.
+    """
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=Retry(total=2, backoff_factor=0.3))
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+# every byte except ASCII digits and the dot, deleted in one bytes.translate pass
+_NON_NUMERIC_BYTES = bytes(b for b in range(256) if b not in b'0123456789.')
+
+
+# the same price strings repeat within a page and across scheduled runs
+@lru_cache(maxsize=4096)
 def parse_price_text(text):
     """Try to extract a float from a price string."""
     if not text:
         return None
     # remove commas, currency symbols, and non-numeric chars except dot
-    filtered = ''.join(ch for ch in text if (ch.isdigit() or ch == '.' or ch == ','))
+    filtered = text.encode('ascii', 'ignore').translate(None, _NON_NUMERIC_BYTES)
     if not filtered:
         return None
-    # remove commas
-    filtered = filtered.replace(',', '')
     try:
         return float(filtered)
-    except Exception:
+    except ValueError:
         return None
 
 
+# CSS selectors are compiled once here instead of being re-parsed on every select_one call
+# Amazon has varied selectors; we try a few common ones
+AMAZON_SELECTORS = [sv.compile(s) for s in (
+    '#priceblock_ourprice',
+    '#priceblock_dealprice',
+    '.a-price .a-offscreen'
+)]
+# Flipkart common selectors
+FLIPKART_SELECTORS = [sv.compile(s) for s in (
+    'div._30jeq3._16Jk6d',
+    'div._30jeq3'
+)]
+
+
+
+class AmazonPriceStrainer(SoupStrainer):
+    """Keeps the elements AMAZON_SELECTORS can match: a priceblock id, or an a-price/a-offscreen class."""
+    PRICE_IDS = frozenset({'priceblock_ourprice', 'priceblock_dealprice'})
+
+    def __init__(self):
+        super().__init__(attrs={'class': re.compile(r'a-price|a-offscreen|priceblock', re.I)})
+
+    def allow_tag_creation(self, nsprefix, name, attrs):
+        # SoupStrainer rules AND together across attributes; the id match has to be OR-ed in here
+        if attrs and attrs.get('id') in self.PRICE_IDS:
+            return True
+        return super().allow_tag_creation(nsprefix, name, attrs)
+
+
+# Strainers limit the parse to the elements (and their subtrees) that the selectors above can match
+AMAZON_STRAINER = AmazonPriceStrainer()
+FLIPKART_STRAINER = SoupStrainer('div', attrs={'class': '_30jeq3'})
+
+TITLE_RE = re.compile(rb'<title[^>]*>(.*?)</title>', re.I | re.S)
+# <meta itemprop="price" content="..."> with the attributes in either order and their values double-quoted,
+# single-quoted or unquoted (as minifiers emit them). Attribute names are anchored so data-content= is not
+# read as content=. Quoted values containing '>' are not supported.
+META_PRICE_RE = re.compile(rb'<meta\b[^>]*(?<![-\w])itemprop\s*=\s*["\']?price(?![-\w])[^>]*>', re.I)
+META_ATTR_RE = re.compile(rb'(?<![-\w])([\w:.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+# a number tagged with a currency marker, scanned over the undecoded page: ₹ is matched by its UTF-8 bytes
+# or as &#8377; / &#x20b9;, and spaces may be written as &nbsp; / &#160; or a UTF-8 no-break space
+PRICE_RE = re.compile(
+    rb'(?:\xe2\x82\xb9|&#8377;|&#[xX]20[bB]9;|\$|Rs\.?)'
+    rb'(?:\s|&nbsp;|&#160;|\xc2\xa0)*'
+    rb'([0-9][0-9,]*(?:\.[0-9]+)?)')
+
+
 def scrape_amazon_price(soup: BeautifulSoup):
-    # Amazon has varied selectors; we try a few common ones
-    selectors = [
-        '#priceblock_ourprice',
-        '#priceblock_dealprice',
-        '.a-price .a-offscreen'
-    ]
-    for sel in selectors:
-        el = soup.select_one(sel)
+    for sel in AMAZON_SELECTORS:
+        el = sel.select_one(soup)
         if el and el.get_text(strip=True):
             price = parse_price_text(el.get_text())
             if price:
@@ -130,13 +248,8 @@ def scrape_amazon_price(soup: BeautifulSoup):
 
 
 def scrape_flipkart_price(soup: BeautifulSoup):
-    # Flipkart common selectors
-    selectors = [
-        'div._30jeq3._16Jk6d',
-        'div._30jeq3'
-    ]
-    for sel in selectors:
-        el = soup.select_one(sel)
+    for sel in FLIPKART_SELECTORS:
+        el = sel.select_one(soup)
         if el and el.get_text(strip=True):
             price = parse_price_text(el.get_text())
             if price:
@@ -144,58 +257,166 @@ def scrape_flipkart_price(soup: BeautifulSoup):
     return None
 
 
+def extract_title(html: bytes, charset=None):
+    """Pull the page <title> straight from the raw bytes, without building a tree.
+    Decoded with the HTTP charset if given, else the charset the page declares, else UTF-8 / windows-1252.
+    """
+    m = TITLE_RE.search(html)
+    if not m:
+        return None
+    raw = m.group(1)
+    declared = None if charset else EncodingDetector.find_declared_encoding(html, is_html=True)
+    for encoding in (charset, declared, 'utf-8', 'windows-1252'):
+        if not encoding:
+            continue
+        try:
+            title = raw.decode(encoding)
+            break
+        except (LookupError, UnicodeDecodeError):
+            continue
+    else:
+        title = raw.decode('utf-8', 'replace')
+    return unescape(title).strip() or None
+
+
+def scrape_site_price(html: bytes, strainer: SoupStrainer, scraper):
+    """Run a site scraper over only the strained elements; re-parse the whole page if that misses."""
+    # lxml is a C parser; given raw bytes it also detects the page encoding itself
+    price = scraper(BeautifulSoup(html, 'lxml', parse_only=strainer))
+    if price is None:
+        price = scraper(BeautifulSoup(html, 'lxml'))
+    return price
+
+
+def scrape_generic_price(html: bytes):
+    """Price lookup for sites without a dedicated handler. Works on the raw bytes; no tree is built."""
+    # Generic attempt: look for meta price or common price patterns
+    for meta in META_PRICE_RE.finditer(html):
+        attrs = {}
+        for m in META_ATTR_RE.finditer(meta.group(0)):
+            # like an HTML parser, the first occurrence of a repeated attribute wins
+            attrs.setdefault(m.group(1).lower(), next(v for v in m.group(2, 3, 4) if v is not None))
+        if attrs.get(b'itemprop') != b'price' or not attrs.get(b'content'):
+            continue
+        price = parse_price_text(unescape(attrs[b'content'].decode('utf-8', 'replace')))
+        if price:
+            return price
+
+    # Fallback: scan the raw page for common price-looking text
+    m = PRICE_RE.search(html)
+    if m:
+        return parse_price_text(m.group(1).decode('ascii')) or None
+    return None
+
+
+# Site handlers keyed by a hostname label (matched as e.g. 'amazon.' in the host); each takes the page bytes
+# and returns a price. Register a new site here; anything unmatched falls back to scrape_generic_price.
+SITE_HANDLERS = {
+    'amazon': partial(scrape_site_price, strainer=AMAZON_STRAINER, scraper=scrape_amazon_price),
+    'flipkart': partial(scrape_site_price, strainer=FLIPKART_STRAINER, scraper=scrape_flipkart_price),
+}
+
+
+def get_site_handler(url: str):
+    host = urlparse(url).netloc.lower()
+    key = next((k for k in SITE_HANDLERS if k + '.' in host), None)
+    return SITE_HANDLERS.get(key, scrape_generic_price)
+
+
+def parse_soup(url: str, html: bytes, charset=None):
+    """Parse a fetched page and attempt to find the price with site-specific rules.
+    charset is the one from the Content-Type header, if any.
+    Returns (name, price) where name is product title if found.
+    """
+    return extract_title(html, charset), get_site_handler(url)(html)
+
+
+# Query params that only track where a click came from; URLs differing just by these are the same page
+TRACKING_PARAMS = ('utm_', 'tag=', 'ref=', 'ref_=')
+
+
+def canonical(url: str):
+    """Drop tracking query params and the fragment so URL variants of one page compare equal."""
+    u = urlparse(url)
+    query = '&'.join(q for q in u.query.split('&') if q and not q.startswith(TRACKING_PARAMS))
+    return urlunparse(u._replace(query=query, fragment=''))
+
+
 def detect_site_and_scrape(url: str):
     """Fetch URL and attempt to parse price with site-specific rules.
     Returns (name, price) where name is product title if found.
     """
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=15)
-        if resp.status_code != 200:
+        with get_http_session().get(url, timeout=15, stream=True) as resp:
+            if resp.status_code != 200:
+                return None, None
+            # resp.encoding falls back to ISO-8859-1 when the header names no charset; only trust an explicit one
+            charset = resp.encoding if 'charset' in resp.headers.get('Content-Type', '').lower() else None
+            buf = bytearray()
+            for chunk in resp.iter_content(CHUNK_SIZE):
+                buf.extend(chunk)
+                if len(buf) >= MAX_PAGE_BYTES:
+                    break
+        return parse_soup(url, bytes(buf[:MAX_PAGE_BYTES]), charset)
+    except Exception as e:
+        print('Scrape error for', url, e)
+        return None, None
+
+
+async def fetch(session: aiohttp.ClientSession, url: str):
+    """Fetch URL without blocking the event loop. Returns (raw page bytes, header charset or None),
+    with the body capped at MAX_PAGE_BYTES, or None on a non-200 response.
+    """
+    async with session.get(url) as resp:
+        if resp.status != 200:
+            return None
+        buf = bytearray()
+        async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+            buf.extend(chunk)
+            if len(buf) >= MAX_PAGE_BYTES:
+                break
+        return bytes(buf[:MAX_PAGE_BYTES]), resp.charset
+
+
+async def fetch_and_parse(session: aiohttp.ClientSession, semaphore: asyncio.Semaphore, url: str):
+    """Scrape a single page. Returns (name, price)."""
+    try:
+        async with semaphore:
+            page = await fetch(session, url)
+        if page is None:
             return None, None
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        title = None
-        title_el = soup.find('title')
-        if title_el:
-            title = title_el.get_text(strip=True)
-
-        # Basic domain checks
-        if 'amazon.' in url:
-            price = scrape_amazon_price(soup)
-            return title, price
-        if 'flipkart.' in url:
-            price = scrape_flipkart_price(soup)
-            return title, price
-
-        # Generic attempt: look for meta price or common price patterns
-        meta_price = soup.select_one('meta[itemprop="price"]')
-        if meta_price and meta_price.get('content'):
-            price = parse_price_text(meta_price.get('content'))
-            return title, price
-
-        # Fallback: try to find common price-looking text
-        possible = soup.find_all(text=True)
-        for t in possible[-200:]:  # search near end of page first
-            txt = t.strip()
-            if txt and any(c.isdigit() for c in txt) and ('₹' in txt or '$' in txt or 'Rs.' in txt):
-                price = parse_price_text(txt)
-                if price:
-                    return title, price
-        return title, None
+        html, charset = page
+        return parse_soup(url, html, charset)
     except Exception as e:
         print('Scrape error for', url, e)
         return None, None
 
+
+async def scrape_products(products):
+    """Scrape all products concurrently, at most SCRAPE_CONCURRENCY pages in flight at a time."""
+    semaphore = asyncio.Semaphore(SCRAPE_CONCURRENCY)
+    # per socket operation, like requests' timeout=15; a total deadline would also count the time a fetch
+    # spends queued for one of the limit_per_host connections, timing out the tail of a single-site catalog
+    timeout = aiohttp.ClientTimeout(sock_connect=15, sock_read=15)
+    # resolve hostnames with c-ares (aiodns) and cache them, so lookups don't hold up other fetches
+    connector = aiohttp.TCPConnector(resolver=AsyncResolver(), ttl_dns_cache=300, limit_per_host=4)
+    async with aiohttp.ClientSession(headers=HEADERS, timeout=timeout, connector=connector) as sess:
+        # one in-flight task per canonical URL; products that share a page await the same task
+        inflight = {}
+        for p in products:
+            key = canonical(p.url)
+            if key not in inflight:
+                inflight[key] = asyncio.ensure_future(fetch_and_parse(sess, semaphore, p.url))
+        await asyncio.gather(*inflight.values())
+    return [(p,) + inflight[canonical(p.url)].result() for p in products]
+
 # -------------------------------
 # Notification
 # -------------------------------
 
-def send_email_notification(to_email: str, product_name: str, url: str, old_price: float, new_price: float):
-    if not SMTP_USER or not SMTP_PASSWORD or not SMTP_HOST:
-        print('SMTP not configured; skipping email')
-        return False
-    try:
-        subject = f'Price drop alert: {product_name} now {new_price}'
-        body = f"""Good news!
+def build_notification(to_email: str, product_name: str, url: str, old_price: float, new_price: float):
+    subject = f'Price drop alert: {product_name} now {new_price}'
+    body = f"""Good news!
 
 The product '{product_name}' has dropped in price.
 
@@ -203,61 +424,127 @@ Old price: {old_price}\nNew price: {new_price}\nLink: {url}
 
 -- Price Tracker
 """
-        msg = MIMEMultipart()
-        msg['From'] = FROM_EMAIL
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-
+    msg = MIMEMultipart()
+    msg['From'] = FROM_EMAIL
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+    return msg
+
+
+def send_batch(notifications: list):
+    """Send price-drop emails over a single SMTP connection.
+    notifications is a list of (to_email, product_name, url, old_price, new_price) tuples.
+    Returns the number of emails sent.
+    """
+    if not notifications:
+        return 0
+    if not SMTP_USER or not SMTP_PASSWORD or not SMTP_HOST:
+        print('SMTP not configured; skipping email')
+        return 0
+    sent = 0
+    try:
         server = smtplib.SMTP(SMTP_HOST, SMTP_PORT)
+    except Exception as e:
+        print('Failed to send email', e)
+        return 0
+    try:
         server.starttls()
         server.login(SMTP_USER, SMTP_PASSWORD)
-        server.sendmail(FROM_EMAIL, to_email, msg.as_string())
-        server.quit()
-        print('Email sent to', to_email)
-        return True
+        for to_email, product_name, url, old_price, new_price in notifications:
+            try:
+                msg = build_notification(to_email, product_name, url, old_price, new_price)
+                server.sendmail(FROM_EMAIL, to_email, msg.as_string())
+                print('Email sent to', to_email)
+                sent += 1
+            except smtplib.SMTPRecipientsRefused as e:
+                print('Failed to send email', e)
     except Exception as e:
         print('Failed to send email', e)
-        return False
+    finally:
+        try:
+            server.quit()
+        except Exception:
+            pass
+    return sent
 
 # -------------------------------
 # Core scheduled job: update prices
 # -------------------------------
 
-def update_all_prices():
+async def update_all_prices_async():
     print('Running scheduled price update at', datetime.utcnow())
-    session = SessionLocal()
-    products = session.query(Product).all()
-    for p in products:
-        title, price = detect_site_and_scrape(p.url)
+    with get_sessionmaker()() as session:
+        products = session.query(Product).all()
+        # last prices for every product in one query instead of one per product
+        last_prices = get_latest_prices(session)
+    # the session is closed before scraping so no pooled connection is held while pages download
+    results = await scrape_products(products)
+    new_rows = []
+    # alerts are worked out here, before the write, from product fields that are already loaded
+    notifications = []
+    for p, title, price in results:
         if price is None:
             print('Could not find price for', p.url)
             continue
-        # get last price
-        last = session.query(PriceHistory).filter(PriceHistory.product_id == p.id).order_by(PriceHistory.timestamp.desc()).first()
-        last_price = last.price if last else None
+        last_price = last_prices.get(p.id)
         # insert history
-        ph = PriceHistory(product_id=p.id, price=price, timestamp=datetime.utcnow())
-        session.add(ph)
-        session.commit()
+        new_rows.append({'product_id': p.id, 'price': price, 'timestamp': datetime.utcnow()})
         print(f'Updated {p.name or title} -> {price} (was {last_price})')
         # check threshold
         if p.desired_price is not None and price <= p.desired_price:
             # If last_price is None or price < last_price -> notify
             if (last_price is None) or (price < last_price):
                 if p.notify_email:
-                    send_email_notification(p.notify_email, p.name or title or 'Product', p.url, last_price, price)
-    session.close()
+                    notifications.append((p.notify_email, p.name or title or 'Product', p.url, last_price, price))
+    # write all history rows in one transaction with a single Core executemany
+    if new_rows:
+        with get_engine().begin() as conn:
+            conn.execute(price_history_t.insert(), new_rows)
+    # SMTP is blocking; keep it off the event loop
+    await asyncio.to_thread(send_batch, notifications)
+
+
+@st.cache_resource
+def start_scheduler():
+    """Start the scheduler on its own event loop thread, once per server process rather than once per rerun.
+    Returns (loop, scheduler).
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='price-scheduler', daemon=True).start()
+    scheduler = AsyncIOScheduler(event_loop=loop)
+    scheduler.add_job(update_all_prices_async, 'interval', minutes=SCRAPE_INTERVAL_MINUTES, id='price_updater', replace_existing=True)
+    scheduler.start()
+    return loop, scheduler
+
+
+def update_all_prices():
+    """Run a price update on the scheduler's loop and wait for it to finish."""
+    loop, _ = start_scheduler()
+    asyncio.run_coroutine_threadsafe(update_all_prices_async(), loop).result()
+
 
 # run scheduler in background
-scheduler = BackgroundScheduler()
-scheduler.add_job(update_all_prices, 'interval', minutes=SCRAPE_INTERVAL_MINUTES, id='price_updater', replace_existing=True)
-scheduler.start()
+start_scheduler()
 
 # -------------------------------
 # Streamlit UI
 # -------------------------------
 
+@st.cache_data(ttl=60)
+def load_product_table() -> pd.DataFrame:
+    """Tracked products with their latest price.
+    Cached so widget reruns don't hit the database; call load_product_table.clear() after writes.
+    """
+    with get_sessionmaker()() as session:
+        products = session.query(Product).all()
+        last_prices = get_latest_prices(session)
+    return pd.DataFrame(
+        [{'id': p.id, 'name': p.name, 'url': p.url, 'desired_price': p.desired_price, 'last_price': last_prices.get(p.id)}
+         for p in products],
+        columns=['id', 'name', 'url', 'desired_price', 'last_price'])
+
+
 st.set_page_config(page_title='Price Tracker', layout='wide')
 st.title('E‑commerce Price Tracker — Streamlit Prototype')
 
@@ -273,35 +560,34 @@ if submit:
     if not url:
         st.sidebar.error('Please provide a product URL')
     else:
-        session = SessionLocal()
-        # fetch initial info
-        title, price = detect_site_and_scrape(url)
-        name = title or url
-        # upsert product
-        prod = session.query(Product).filter(Product.url == url).first()
-        if prod:
-            prod.name = name
-            prod.desired_price = desired_price if desired_price > 0 else None
-            prod.notify_email = notify_email or None
-            session.commit()
-            st.sidebar.success('Product updated')
-        else:
-            newp = Product(name=name, url=url, desired_price=(desired_price if desired_price > 0 else None), notify_email=(notify_email or None))
-            session.add(newp)
-            session.commit()
-            # add current price to history
-            if price is not None:
-                ph = PriceHistory(product_id=newp.id, price=price, timestamp=datetime.utcnow())
-                session.add(ph)
+        with get_sessionmaker()() as session:
+            # fetch initial info
+            title, price = detect_site_and_scrape(url)
+            name = title or url
+            # upsert product
+            prod = session.query(Product).filter(Product.url == url).first()
+            if prod:
+                prod.name = name
+                prod.desired_price = desired_price if desired_price > 0 else None
+                prod.notify_email = notify_email or None
+                session.commit()
+                st.sidebar.success('Product updated')
+            else:
+                newp = Product(name=name, url=url, desired_price=(desired_price if desired_price > 0 else None), notify_email=(notify_email or None))
+                session.add(newp)
                 session.commit()
-            st.sidebar.success('Product added')
-        session.close()
+                # add current price to history
+                if price is not None:
+                    ph = PriceHistory(product_id=newp.id, price=price, timestamp=datetime.utcnow())
+                    session.add(ph)
+                    session.commit()
+                st.sidebar.success('Product added')
+        load_product_table.clear()
 
 # Main area: list products
-session = SessionLocal()
-products = session.query(Product).all()
+products = load_product_table()
 
-if not products:
+if products.empty:
     st.info('No products being tracked — add one from the sidebar')
 else:
     cols = st.columns([3, 1, 1, 2])
@@ -310,34 +596,32 @@ else:
     cols[2].markdown('**Desired**')
     cols[3].markdown('**Actions**')
 
-    for p in products:
-        # get latest price
-        last = session.query(PriceHistory).filter(PriceHistory.product_id == p.id).order_by(PriceHistory.timestamp.desc()).first()
-        last_price = last.price if last else None
+    for p in products.itertuples(index=False):
         c0, c1, c2, c3 = st.columns([3, 1, 1, 2])
         c0.markdown(f"**{p.name}**  \n {p.url}")
-        c1.markdown(f"{last_price if last_price is not None else '—'}")
-        c2.markdown(f"{p.desired_price if p.desired_price is not None else '—'}")
+        c1.markdown(f"{p.last_price if pd.notna(p.last_price) else '—'}")
+        c2.markdown(f"{p.desired_price if pd.notna(p.desired_price) else '—'}")
         with c3:
             if st.button(f'View {p.id}', key=f'view_{p.id}'):
                 # show history chart
-                df = pd.read_sql_query(f"SELECT * FROM price_history WHERE product_id={p.id} ORDER BY timestamp", engine)
+                df = pd.read_sql_query(
+                    text("SELECT timestamp, price FROM price_history WHERE product_id = :pid ORDER BY timestamp"),
+                    get_engine(), params={'pid': int(p.id)}, parse_dates=['timestamp'])
                 if df.empty:
                     st.warning('No price history yet for this product')
                 else:
-                    df['timestamp'] = pd.to_datetime(df['timestamp'])
                     fig = px.line(df, x='timestamp', y='price', title=p.name or p.url)
                     st.plotly_chart(fig, use_container_width=True)
                     st.write(df[['timestamp','price']].tail(50))
             if st.button(f'Remove {p.id}', key=f'remove_{p.id}'):
                 # delete product and its history
-                session.query(PriceHistory).filter(PriceHistory.product_id == p.id).delete()
-                session.delete(p)
-                session.commit()
+                with get_sessionmaker()() as session:
+                    session.query(PriceHistory).filter(PriceHistory.product_id == int(p.id)).delete()
+                    session.query(Product).filter(Product.id == int(p.id)).delete()
+                    session.commit()
+                load_product_table.clear()
                 st.experimental_rerun()
 
-session.close()
-
 st.markdown('---')
 st.write('Scheduler running in background to update prices every', SCRAPE_INTERVAL_MINUTES, 'minutes.')
 
@@ -345,16 +629,18 @@ st.write('Scheduler running in background to update prices every', SCRAPE_INTERV
 if st.button('Run price update now'):
     with st.spinner('Running update...'):
         update_all_prices()
+        load_product_table.clear()
         st.success('Update complete — refresh the page to see new prices')
 
 st.markdown('## Notes & Troubleshooting')
 st.markdown('''
-- If a site's prices are not being detected, update the scraping selectors in the `scrape_amazon_price` or `scrape_flipkart_price` functions.
+- If a site's prices are not being detected, update the scraping selectors in `AMAZON_SELECTORS` or `FLIPKART_SELECTORS`.
 - For real-world use, add request throttling and rotate user agents and proxies to avoid being blocked.
 - Use a transactional email service in production instead of SMTP login.
 ''')
 
 # keep the scheduler alive in streamlit.
-# streamlit will run this script top-to-bottom on reruns; we've started a BackgroundScheduler which will continue while the process is alive.
+# streamlit will run this script top-to-bottom on reruns; start_scheduler is a cached resource, so the AsyncIOScheduler
+# and its event loop thread are created once and continue while the process is alive.
 
 # end of file